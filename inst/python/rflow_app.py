@@ -3,12 +3,24 @@ Rflow PyQt6 Desktop Application
 Modern Electron-style wrapper for Rflow web interface
 """
 
+import hmac
+import json
+import os
 import sys
+import time
 from PyQt6.QtWidgets import QApplication, QMainWindow, QVBoxLayout, QWidget
 from PyQt6.QtWebEngineWidgets import QWebEngineView
 from PyQt6.QtWebEngineCore import QWebEngineSettings, QWebEnginePage
-from PyQt6.QtCore import QUrl, Qt, QSize
+from PyQt6.QtCore import QUrl, Qt, QSize, QObject, QTimer, QEvent, pyqtSignal
 from PyQt6.QtGui import QIcon, QPalette, QColor
+from PyQt6.QtNetwork import (
+    QHostAddress, QNetworkAccessManager, QNetworkReply, QNetworkRequest, QTcpServer
+)
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
 
 
 class RflowWebPage(QWebEnginePage):
@@ -20,12 +32,260 @@ class RflowWebPage(QWebEnginePage):
         pass
 
 
+def _env_float(name, default):
+    """Read a numeric setting from the environment, falling back to default"""
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return float(default)
+
+
+def process_rss_bytes(pid):
+    """Resident memory of a process in bytes, or None if it cannot be read"""
+    if not pid:
+        return None
+    if psutil is not None:
+        try:
+            return psutil.Process(pid).memory_info().rss
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            return None
+    # Fallback for Linux installs without psutil
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+class WebEngineGovernor(QObject):
+    """Freezes the web page while the window is hidden and watches its memory
+
+    Chromium only allows non-active lifecycle states for pages that are not
+    visible, so the governor acts once the window is minimized or hidden:
+    the page is frozen (timers, observers and animations stop) after
+    RFLOW_FREEZE_AFTER seconds, or straight away when the renderer grows
+    past RFLOW_MEMORY_LIMIT_MB. Showing the window makes the page active
+    again.
+
+    RFLOW_MEMORY_LIMIT_MB is a reporting threshold: crossing it is printed
+    and emitted as memory_pressure, and a hidden page is frozen early.
+    Freezing saves renderer CPU but releases little memory, so the freeze
+    report shows the renderer's size before and after rather than claiming
+    memory back.
+
+    Discarding the page (releasing the renderer entirely) is opt-in via
+    RFLOW_DISCARD_AFTER. A discard closes the Shiny websocket, and the
+    Rflow client calls stopApp() when its session ends, so the reload on
+    restore finds no server and the chat is lost. Only enable it for apps
+    that survive a page reload.
+    """
+
+    # Emitted with (transition, bytes reclaimed) after each state change
+    memory_reclaimed = pyqtSignal(str, int)
+    # Emitted with the renderer's resident bytes when it crosses the limit
+    memory_pressure = pyqtSignal(int)
+
+    def __init__(self, window, page, freeze_after=None, discard_after=None,
+                 memory_limit_mb=None, poll_interval=None):
+        super().__init__(window)
+        self.window = window
+        self.page = page
+
+        # Thresholds (seconds / MB); a value of 0 disables that rule
+        self.freeze_after = (freeze_after if freeze_after is not None
+                             else _env_float("RFLOW_FREEZE_AFTER", 30))
+        self.discard_after = (discard_after if discard_after is not None
+                              else _env_float("RFLOW_DISCARD_AFTER", 0))
+        self.memory_limit_mb = (memory_limit_mb if memory_limit_mb is not None
+                                else _env_float("RFLOW_MEMORY_LIMIT_MB", 400))
+        poll_interval = (poll_interval if poll_interval is not None
+                         else _env_float("RFLOW_GOVERNOR_POLL", 5))
+
+        self.hidden_since = None
+        self.total_reclaimed = 0
+        self.over_limit = False
+
+        # Samples renderer memory; cheap enough to run while visible too
+        self.timer = QTimer(self)
+        self.timer.setInterval(int(poll_interval * 1000))
+        self.timer.timeout.connect(self.check)
+        self.timer.start()
+
+        window.installEventFilter(self)
+
+    def eventFilter(self, obj, event):
+        """Track window visibility and minimize/restore"""
+        if obj is self.window and event.type() in (
+            QEvent.Type.Show, QEvent.Type.Hide, QEvent.Type.WindowStateChange
+        ):
+            if self.window.isMinimized() or not self.window.isVisible():
+                self.on_hidden()
+            else:
+                self.on_shown()
+        return False
+
+    def on_hidden(self):
+        """Window was minimized or hidden"""
+        if self.hidden_since is not None:
+            return
+        self.hidden_since = time.monotonic()
+        # A minimized window keeps its widgets "visible", so tell the page
+        self.page.setVisible(False)
+
+    def on_shown(self):
+        """Window is back on screen - restore the page immediately"""
+        if self.hidden_since is None:
+            return
+        self.hidden_since = None
+        if self.page.lifecycleState() != QWebEnginePage.LifecycleState.Active:
+            self.page.setLifecycleState(QWebEnginePage.LifecycleState.Active)
+        self.page.setVisible(True)
+
+    def check(self):
+        """Sample renderer memory and move a hidden page to the state it calls for"""
+        state = self.page.lifecycleState()
+        if state == QWebEnginePage.LifecycleState.Discarded:
+            return
+
+        rss = process_rss_bytes(self.page.renderProcessPid())
+        over_limit = (
+            self.memory_limit_mb > 0 and rss is not None
+            and rss > self.memory_limit_mb * 1024 * 1024
+        )
+        if over_limit and not self.over_limit:
+            print(
+                f"[MEMORY] Renderer using {rss / 1048576:.1f} MB, over the "
+                f"{self.memory_limit_mb:g} MB limit (reported only; the page "
+                f"is frozen as soon as the window is hidden)"
+            )
+            self.memory_pressure.emit(rss)
+        self.over_limit = over_limit
+
+        if self.hidden_since is None:
+            return
+        hidden_for = time.monotonic() - self.hidden_since
+
+        if self.discard_after > 0 and hidden_for >= self.discard_after:
+            self.transition(QWebEnginePage.LifecycleState.Discarded, rss)
+        elif (state == QWebEnginePage.LifecycleState.Active
+              and (over_limit or (self.freeze_after > 0 and hidden_for >= self.freeze_after))):
+            self.transition(QWebEnginePage.LifecycleState.Frozen, rss)
+
+    def transition(self, state, rss_before):
+        """Apply a lifecycle state and measure the renderer once it settles"""
+        try:
+            self.page.setLifecycleState(state)
+        except Exception as e:
+            print(f"Could not change page lifecycle state: {e}")
+            return
+        if rss_before is not None:
+            name = state.name.lower()
+            QTimer.singleShot(1000, lambda: self.report(name, rss_before))
+
+    def report(self, name, rss_before):
+        """Report the renderer's memory after a freeze or discard"""
+        # A discarded page has no renderer process left
+        rss_after = process_rss_bytes(self.page.renderProcessPid()) or 0
+        reclaimed = max(rss_before - rss_after, 0)
+        self.total_reclaimed += reclaimed
+        if name == "discarded":
+            print(
+                f"[MEMORY] Page discarded: reclaimed {reclaimed / 1048576:.1f} MB "
+                f"({self.total_reclaimed / 1048576:.1f} MB total)"
+            )
+        else:
+            print(
+                f"[MEMORY] Page {name} (CPU paused): renderer "
+                f"{rss_before / 1048576:.1f} MB -> {rss_after / 1048576:.1f} MB"
+            )
+        self.memory_reclaimed.emit(name, reclaimed)
+
+    def stop(self):
+        """Stop monitoring the window"""
+        self.timer.stop()
+        self.window.removeEventFilter(self)
+
+
+# Shown instantly while the Shiny app is still starting
+PLACEHOLDER_HTML = """
+<html>
+<body style="margin: 0; height: 100vh; display: flex; align-items: center;
+             justify-content: center; background: #2d2d30; color: #ffffff;
+             font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif;">
+    <div style="text-align: center;">
+        <div style="font-size: 22px; font-weight: 600;">Rflow AI Assistant</div>
+        <div style="margin-top: 8px; font-size: 13px; opacity: 0.7;">Starting...</div>
+    </div>
+</body>
+</html>
+"""
+
+
+class ReadinessProbe(QObject):
+    """Polls the Shiny app until it answers, then emits ready"""
+
+    ready = pyqtSignal()
+    failed = pyqtSignal(str)
+
+    def __init__(self, url, parent=None, interval=0.1, timeout=None):
+        super().__init__(parent)
+        self.url = QUrl(url)
+        self.interval_ms = int(interval * 1000)
+        self.timeout = (timeout if timeout is not None
+                        else _env_float("RFLOW_READY_TIMEOUT", 30))
+        self.manager = QNetworkAccessManager(self)
+        self.started = None
+        self.active = False
+
+    def start(self):
+        """Begin polling"""
+        self.started = time.monotonic()
+        self.active = True
+        self.poll()
+
+    def poll(self):
+        """Send one request to the app"""
+        if not self.active:
+            return
+        request = QNetworkRequest(self.url)
+        request.setTransferTimeout(1000)
+        reply = self.manager.get(request)
+        reply.finished.connect(lambda: self.on_reply(reply))
+
+    def on_reply(self, reply):
+        """Emit ready on success, otherwise retry until the timeout"""
+        error = reply.error()
+        message = reply.errorString()
+        reply.deleteLater()
+        if not self.active:
+            return
+        if error == QNetworkReply.NetworkError.NoError:
+            self.active = False
+            self.ready.emit()
+        elif time.monotonic() - self.started >= self.timeout:
+            self.active = False
+            self.failed.emit(message)
+        else:
+            QTimer.singleShot(self.interval_ms, self.poll)
+
+    def stop(self):
+        """Stop polling"""
+        self.active = False
+
+
 class RflowWindow(QMainWindow):
     """Main Rflow application window - Electron-style wrapper"""
+
+    # Emitted when the user closes the window
+    closed = pyqtSignal()
     
-    def __init__(self, app_url):
+    def __init__(self, app_url=None):
         super().__init__()
-        self.app_url = app_url
+        self.app_url = None
+        self.probe = None
         
         # Window configuration
         self.setWindowTitle("Rflow AI Assistant")
@@ -40,7 +300,14 @@ class RflowWindow(QMainWindow):
         
         # Create web view
         self.setup_webview()
-        
+
+        # Freeze/discard the page while the window is hidden
+        self.governor = WebEngineGovernor(self, self.web_view.page())
+
+        # Start waiting for the app; the placeholder shows until it answers
+        if app_url:
+            self.open_app(app_url)
+
         # Center window on screen
         self.center_on_screen()
         
@@ -90,8 +357,8 @@ class RflowWindow(QMainWindow):
         # Enable smooth scrolling
         settings.setAttribute(QWebEngineSettings.WebAttribute.ScrollAnimatorEnabled, True)
         
-        # Load the Shiny app URL
-        self.web_view.setUrl(QUrl(self.app_url))
+        # Show the placeholder until the Shiny app is ready
+        self.web_view.setHtml(PLACEHOLDER_HTML)
         
         # Add to layout
         layout.addWidget(self.web_view)
@@ -100,12 +367,36 @@ class RflowWindow(QMainWindow):
         self.web_view.loadStarted.connect(self.on_load_started)
         self.web_view.loadFinished.connect(self.on_load_finished)
         
+    def open_app(self, app_url):
+        """Navigate to the Shiny app as soon as it accepts connections"""
+        if self.probe is not None:
+            # The daemon window is long-lived, so don't let old probes pile up
+            self.probe.stop()
+            self.probe.deleteLater()
+        if self.app_url is not None and app_url != self.app_url:
+            self.web_view.setHtml(PLACEHOLDER_HTML)
+        self.app_url = app_url
+        self.setWindowTitle("Rflow AI Assistant - Starting...")
+
+        self.probe = ReadinessProbe(app_url, self)
+        self.probe.ready.connect(lambda: self.web_view.setUrl(QUrl(app_url)))
+        self.probe.failed.connect(lambda error: self.on_probe_failed(app_url, error))
+        self.probe.start()
+
+    def on_probe_failed(self, app_url, error):
+        """The app never answered - load it anyway so the error page shows"""
+        print(f"Rflow app did not respond: {error}")
+        self.web_view.setUrl(QUrl(app_url))
+
     def on_load_started(self):
         """Called when page starts loading"""
         self.setWindowTitle("Rflow AI Assistant - Loading...")
         
     def on_load_finished(self, success):
         """Called when page finishes loading"""
+        if not self.web_view.url().scheme().startswith("http"):
+            # Placeholder page
+            return
         if success:
             self.setWindowTitle("Rflow AI Assistant")
             # Inject custom CSS for even better styling (optional)
@@ -360,20 +651,101 @@ class RflowWindow(QMainWindow):
     def closeEvent(self, event):
         """Handle window close event"""
         # Clean shutdown
+        if self.probe is not None:
+            self.probe.stop()
+        self.governor.stop()
         self.web_view.setUrl(QUrl("about:blank"))
         event.accept()
+        self.closed.emit()
 
 
-def main():
-    """Main entry point"""
-    if len(sys.argv) < 2:
-        print("Usage: python rflow_app.py <app_url>")
-        print("Example: python rflow_app.py http://127.0.0.1:8080")
-        sys.exit(1)
-        
-    app_url = sys.argv[1]
-    
-    # Create application
+class LauncherDaemon(QObject):
+    """Keeps a warmed-up window ready and opens it on request from R
+
+    Listens on a localhost port for one JSON command per line:
+    {"cmd": "open", "url": ...}, {"cmd": "ping"} or {"cmd": "quit"}.
+    Every command must carry the per-user "token" that R passes in
+    RFLOW_LAUNCHER_TOKEN, so other local users cannot drive the launcher.
+    The interpreter, Qt and the Chromium processes are already running,
+    so an open only has to show the window and wait for Shiny.
+    """
+
+    def __init__(self, app, port, token):
+        super().__init__()
+        self.app = app
+        self.token = token
+        self.window = None
+
+        self.server = QTcpServer(self)
+        self.server.newConnection.connect(self.on_connection)
+        if not self.server.listen(QHostAddress(QHostAddress.SpecialAddress.LocalHost), port):
+            raise RuntimeError(f"Could not listen on port {port}: {self.server.errorString()}")
+
+        self.prewarm()
+
+    def prewarm(self):
+        """Build a hidden window so the next open only has to show it"""
+        self.window = RflowWindow()
+        self.window.closed.connect(self.on_window_closed)
+
+    def on_window_closed(self):
+        """Replace the closed window with a fresh hidden one"""
+        self.window.deleteLater()
+        self.prewarm()
+
+    def on_connection(self):
+        """Accept pending connections from R"""
+        while self.server.hasPendingConnections():
+            conn = self.server.nextPendingConnection()
+            conn.readyRead.connect(lambda conn=conn: self.on_ready_read(conn))
+            conn.disconnected.connect(conn.deleteLater)
+
+    def on_ready_read(self, conn):
+        """Handle one command line and reply with a JSON status line"""
+        if not conn.canReadLine():
+            return
+        line = bytes(conn.readLine()).decode("utf-8").strip()
+        try:
+            command = json.loads(line)
+            if not hmac.compare_digest(str(command.get("token", "")), self.token):
+                reply = {"status": "unauthorized", "message": "Invalid launcher token"}
+            else:
+                reply = self.dispatch(command)
+        except Exception as e:
+            reply = {"status": "error", "message": str(e)}
+        conn.write((json.dumps(reply) + "\n").encode("utf-8"))
+        conn.flush()
+        conn.disconnectFromHost()
+
+    def dispatch(self, command):
+        """Run a launcher command"""
+        cmd = command.get("cmd")
+        if cmd == "ping":
+            return {"status": "ok", "pid": os.getpid()}
+        if cmd == "open":
+            url = command.get("url", "")
+            # SECURITY: Only open the local Shiny app
+            parsed = QUrl(url)
+            if parsed.scheme() != "http" or parsed.host() not in ("127.0.0.1", "localhost", "::1"):
+                raise ValueError(f"Refusing to open non-local URL: {url}")
+            self.window.open_app(url)
+            # show()/raise_() leave a minimized window minimized
+            if self.window.isMinimized():
+                self.window.setWindowState(
+                    self.window.windowState() & ~Qt.WindowState.WindowMinimized
+                )
+            self.window.show()
+            self.window.raise_()
+            self.window.activateWindow()
+            return {"status": "ok"}
+        if cmd == "quit":
+            QTimer.singleShot(0, self.app.quit)
+            return {"status": "ok"}
+        raise ValueError(f"Unknown command: {cmd}")
+
+
+def create_application():
+    """Create the QApplication with the Rflow style and dark palette"""
     app = QApplication(sys.argv)
     app.setApplicationName("Rflow AI Assistant")
     app.setOrganizationName("Rflow")
@@ -396,10 +768,32 @@ def main():
     dark_palette.setColor(QPalette.ColorRole.Highlight, QColor(102, 126, 234))
     dark_palette.setColor(QPalette.ColorRole.HighlightedText, QColor(0, 0, 0))
     app.setPalette(dark_palette)
+    return app
+
+
+def main():
+    """Main entry point"""
+    if len(sys.argv) < 2 or (sys.argv[1] == "--daemon" and len(sys.argv) < 3):
+        print("Usage: python rflow_app.py <app_url>")
+        print("       python rflow_app.py --daemon <port>")
+        print("Example: python rflow_app.py http://127.0.0.1:8080")
+        sys.exit(1)
+        
+    # Create application
+    app = create_application()
     
-    # Create and show main window
-    window = RflowWindow(app_url)
-    window.show()
+    if sys.argv[1] == "--daemon":
+        # Warm-start launcher: stay alive between Rflow sessions
+        app.setQuitOnLastWindowClosed(False)
+        token = os.environ.get("RFLOW_LAUNCHER_TOKEN", "")
+        if not token:
+            print("RFLOW_LAUNCHER_TOKEN must be set in daemon mode")
+            sys.exit(1)
+        daemon = LauncherDaemon(app, int(sys.argv[2]), token)
+    else:
+        # Create and show main window
+        window = RflowWindow(sys.argv[1])
+        window.show()
     
     # Run application
     sys.exit(app.exec())
@@ -0,0 +1,178 @@
+"""
+Rflow conversation context
+Token-budgeted conversation history for the native GUI (no Qt dependency)
+"""
+
+import os
+import sqlite3
+from collections import deque
+from pathlib import Path
+
+
+def estimate_tokens(text):
+    """Rough token count for a message (about 4 characters per token)"""
+    return max(1, (len(text) + 3) // 4)
+
+
+def _env_int(name, default):
+    """Read an integer setting from the environment, falling back to default"""
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        return int(default)
+
+
+def session_db_path():
+    """Path of the SQLite session store written by the R package
+
+    RFLOW_DB_PATH overrides it. Otherwise this mirrors R's get_db_path(),
+    which uses R's HOME - the Documents folder on Windows unless HOME is set.
+    """
+    override = os.environ.get("RFLOW_DB_PATH")
+    if override:
+        return override
+    home = os.environ.get("HOME")
+    if not home:
+        home = os.path.expanduser("~")
+        if os.name == "nt":
+            home = os.path.join(home, "Documents")
+    return os.path.join(home, ".rflow", "chat_history.sqlite")
+
+
+class ConversationContext:
+    """Conversation history kept within a token budget
+
+    Each message's token estimate is computed once and cached on the entry,
+    and the running total is updated incrementally. When the total goes over
+    RFLOW_CONTEXT_TOKENS, old tool results are compacted into short
+    references (reloadable from the session store by message_id), then the
+    oldest turns are evicted. A turn is a user message plus everything up to
+    the next user message, so the kept history always starts with a user
+    message and never keeps a tool result without its tool call. The last
+    RFLOW_CONTEXT_KEEP_RECENT messages are never touched. A tool result is
+    only compacted when its reference is smaller than the original.
+    """
+
+    def __init__(self, token_budget=None, keep_recent=None, db_path=None):
+        self.token_budget = (token_budget if token_budget is not None
+                             else _env_int("RFLOW_CONTEXT_TOKENS", 100000))
+        self.keep_recent = (keep_recent if keep_recent is not None
+                            else _env_int("RFLOW_CONTEXT_KEEP_RECENT", 6))
+        self.db_path = db_path or session_db_path()
+
+        self.messages = deque()
+        # Tool results not yet compacted, oldest first
+        self.tool_results = deque()
+        self.total_tokens = 0
+        self.next_seq = 0
+
+    def __len__(self):
+        return len(self.messages)
+
+    def __iter__(self):
+        return iter(self.messages)
+
+    def add(self, role, content, message_id=None, tool_result=False):
+        """Append a message and enforce the token budget"""
+        entry = {
+            "seq": self.next_seq,
+            "role": role,
+            "content": content,
+            "tokens": estimate_tokens(content),
+            "message_id": message_id,
+            "tool_result": tool_result,
+            "compacted": False,
+        }
+        self.next_seq += 1
+        self.messages.append(entry)
+        self.total_tokens += entry["tokens"]
+        if tool_result:
+            self.tool_results.append(entry)
+        self.enforce_budget()
+        return entry
+
+    def enforce_budget(self):
+        """Compact old tool results, then evict old messages, until within budget"""
+        protected_from = self.next_seq - self.keep_recent
+
+        while self.total_tokens > self.token_budget and self.tool_results:
+            entry = self.tool_results[0]
+            if entry["seq"] >= protected_from:
+                break
+            self.tool_results.popleft()
+            # Results too small to shrink are left for eviction
+            self.compact(entry)
+
+        while self.total_tokens > self.token_budget and self.messages:
+            turn = self.oldest_turn_length()
+            if self.messages[turn - 1]["seq"] >= protected_from:
+                break
+            for _ in range(turn):
+                self.total_tokens -= self.messages.popleft()["tokens"]
+
+    @staticmethod
+    def starts_turn(entry):
+        """True for a user message that is not a tool result"""
+        return entry["role"] == "user" and not entry["tool_result"]
+
+    def oldest_turn_length(self):
+        """Number of messages before the second turn start
+
+        Leading messages that are not a turn start are counted with the
+        first turn, so evicting it always leaves a user message first.
+        """
+        index = 0
+        while index < len(self.messages) and not self.starts_turn(self.messages[index]):
+            index += 1
+        index += 1
+        while index < len(self.messages) and not self.starts_turn(self.messages[index]):
+            index += 1
+        return min(index, len(self.messages))
+
+    def compact(self, entry):
+        """Replace a tool result with a reference to the session store
+
+        Returns False, leaving the entry untouched, if the reference would
+        not be smaller than the original.
+        """
+        if entry["message_id"] is not None:
+            reference = (f"[Tool result compacted ({entry['tokens']} tokens) - "
+                         f"message {entry['message_id']} in session store]")
+        else:
+            reference = (f"[Tool result compacted ({entry['tokens']} tokens)] "
+                         f"{entry['content'][:200]}")
+        tokens = estimate_tokens(reference)
+        if tokens >= entry["tokens"]:
+            return False
+        self.total_tokens += tokens - entry["tokens"]
+        entry["content"] = reference
+        entry["tokens"] = tokens
+        entry["compacted"] = True
+        return True
+
+    def reload(self, message_id):
+        """Fetch the full text of a stored message from the session store
+
+        The store belongs to the R package, so it is opened read-only and a
+        missing or unreadable database returns None.
+        """
+        uri = Path(self.db_path).resolve().as_uri() + "?mode=ro"
+        try:
+            con = sqlite3.connect(uri, uri=True)
+            try:
+                row = con.execute(
+                    "SELECT content, tool_results FROM messages WHERE message_id = ?",
+                    (message_id,)
+                ).fetchone()
+            finally:
+                con.close()
+        except sqlite3.Error:
+            return None
+        if row is None:
+            return None
+        content, tool_results = row
+        return tool_results or content
+
+    def to_messages(self):
+        """Role/content pairs for the next request"""
+        return [{"role": m["role"], "content": m["content"]} for m in self.messages]
@@ -3,12 +3,18 @@ Rflow PyQt6 Desktop Application
 Native Windows wrapper for Rflow web interface (like Electron)
 """
 
+import socket
 import sys
-from PyQt6.QtWidgets import QApplication, QMainWindow
+from PyQt6.QtWidgets import (
+    QApplication, QMainWindow, QWidget, QFrame, QVBoxLayout, QHBoxLayout,
+    QLabel, QTextEdit, QPushButton, QScrollArea
+)
 from PyQt6.QtWebEngineWidgets import QWebEngineView
 from PyQt6.QtWebEngineCore import QWebEngineSettings
-from PyQt6.QtCore import QUrl, Qt
-from PyQt6.QtGui import QIcon
+from PyQt6.QtCore import QUrl, Qt, QObject, pyqtSignal
+from PyQt6.QtGui import QIcon, QFont
+
+from rflow_context import ConversationContext
 
 
 class MessageReceiver(QObject):
@@ -111,7 +117,7 @@ class RflowWindow(QMainWindow):
         super().__init__()
         self.api_url = api_url
         self.env_url = env_url
-        self.conversation_history = []
+        self.conversation_history = ConversationContext()
         
         self.setWindowTitle("Rflow AI Assistant")
         self.setGeometry(100, 100, 1200, 800)
@@ -261,6 +267,7 @@ class RflowWindow(QMainWindow):
             
         # Add user message to chat
         self.add_message(text, is_user=True)
+        self.conversation_history.add("user", text)
         self.input_field.clear()
         
         # Send to R backend
@@ -281,15 +288,21 @@ class RflowWindow(QMainWindow):
             host = parsed.hostname or '127.0.0.1'
             port = parsed.port or 80
             
+            # The request carries the budgeted history, not every message so far
+            request_messages = self.conversation_history.to_messages()
+            
             # For now, just show a message that the connection is working
             # In a full implementation, this would send to a Shiny endpoint
-            self.add_message(
+            reply = (
                 f"Connected to backend at {host}:{port}\n"
-                f"Message received: {message}\n\n"
+                f"Message received: {message}\n"
+                f"Request context: {len(request_messages)} messages, "
+                f"~{self.conversation_history.total_tokens} tokens\n\n"
                 f"Note: Full backend integration requires Shiny API endpoints.\n"
-                f"This is a demonstration of the native PyQt6 GUI.",
-                is_user=False
+                f"This is a demonstration of the native PyQt6 GUI."
             )
+            self.add_message(reply, is_user=False)
+            self.conversation_history.add("assistant", reply)
             
         except Exception as e:
             raise Exception(f"Failed to send message: {str(e)}")
@@ -0,0 +1,422 @@
+"""
+Rflow GUI Load Generator
+Replays synthetic or recorded R -> GUI message streams into MessageReceiver
+
+Messages use the protocol MessageReceiver implements: one TCP connection
+per message to the receiver port. Each message is a JSON envelope
+
+    {"type": "token" | "tool_status" | ..., "step": 0, "seq": 17, "sent": 1712.03,
+     "content": "..."}
+
+so the GUI side can measure delivery latency and attribute each message
+to the rate step that sent it. A recorded stream is a JSONL
+file with one {"at": <seconds from start>, "type": ..., "content": ...}
+object per line.
+
+Runs headless (offscreen Qt platform) against rflow_gui.RflowWindow by
+default and reports throughput, queue depth, dropped and late messages and
+UI frame stalls for each offered rate, which makes the saturation point of
+the GUI visible.
+
+Examples:
+    python rflow_loadgen.py --rate 50,100,200,400 --duration 10
+    python rflow_loadgen.py --replay session.jsonl --speed 4 --concurrency 8
+"""
+
+import argparse
+import json
+import math
+import os
+import queue
+import random
+import socket
+import sys
+import threading
+import time
+
+
+def positive_float(value):
+    """argparse type for a number that must be greater than zero"""
+    number = float(value)
+    if number <= 0:
+        raise argparse.ArgumentTypeError(f"must be greater than 0, got {value}")
+    return number
+
+
+def positive_int(value):
+    """argparse type for a whole number that must be greater than zero"""
+    number = int(value)
+    if number <= 0:
+        raise argparse.ArgumentTypeError(f"must be greater than 0, got {value}")
+    return number
+
+
+def positive_floats(value):
+    """argparse type for a comma-separated list of positive numbers"""
+    return [positive_float(x) for x in value.split(",")]
+
+
+def parse_size_spec(spec):
+    """Turn a payload-size spec into a function returning a byte count
+
+    fixed:N            always N bytes
+    uniform:A-B        uniformly between A and B bytes
+    lognormal:M,S      log-normal with median M bytes and sigma S
+    """
+    kind, _, args = spec.partition(":")
+    try:
+        if kind == "fixed":
+            size = int(args)
+            return lambda rng: size
+        if kind == "uniform":
+            low, high = (int(x) for x in args.split("-"))
+            return lambda rng: rng.randint(low, high)
+        if kind == "lognormal":
+            median, sigma = args.split(",")
+            mu = math.log(float(median))
+            sigma = float(sigma)
+            return lambda rng: max(1, int(rng.lognormvariate(mu, sigma)))
+    except ValueError:
+        pass
+    raise ValueError(f"Invalid size spec: {spec}")
+
+
+def synthetic_schedule(rate, duration, size_of, token_ratio, seed):
+    """Evenly spaced (offset, type, content) tuples at the offered rate"""
+    rng = random.Random(seed)
+    count = int(rate * duration)
+    schedule = []
+    for i in range(count):
+        kind = "token" if rng.random() < token_ratio else "tool_status"
+        schedule.append((i / rate, kind, "x" * size_of(rng)))
+    return schedule
+
+
+def replay_schedule(path, speed):
+    """(offset, type, content) tuples read from a recorded JSONL stream"""
+    schedule = []
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if not isinstance(record, dict):
+                raise ValueError(f"{path}:{number}: expected a JSON object per line")
+            content = record.get("content", "")
+            if not isinstance(content, str):
+                content = json.dumps(content)
+            schedule.append((float(record.get("at", 0)) / speed,
+                             record.get("type", "replay"), content))
+    schedule.sort(key=lambda item: item[0])
+    return schedule
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list, or 0 when empty"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class LoadSender:
+    """Sends a schedule to the receiver port from several threads"""
+
+    def __init__(self, port, schedule, concurrency, step=0, connect_timeout=1.0):
+        self.port = port
+        self.step = step
+        self.schedule = schedule
+        self.concurrency = concurrency
+        self.connect_timeout = connect_timeout
+        self.lock = threading.Lock()
+        self.sent = 0
+        self.failed = 0
+        self.late_sends = 0
+        self.threads = []
+
+    def start(self):
+        """Queue the schedule and start the sender threads"""
+        work = queue.Queue()
+        self.started = time.monotonic()
+        for seq, (offset, kind, content) in enumerate(self.schedule):
+            work.put((seq, offset, kind, content))
+        for _ in range(self.concurrency):
+            thread = threading.Thread(target=self.run, args=(work,), daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def run(self, work):
+        """Sender thread: send each message at its scheduled time"""
+        while True:
+            try:
+                seq, offset, kind, content = work.get_nowait()
+            except queue.Empty:
+                return
+            delay = self.started + offset - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            elif delay < -0.05:
+                # The senders themselves could not keep up with the schedule
+                with self.lock:
+                    self.late_sends += 1
+
+            message = json.dumps({
+                "type": kind, "step": self.step, "seq": seq, "sent": time.monotonic(), "content": content
+            }).encode("utf-8")
+            try:
+                with socket.create_connection(("127.0.0.1", self.port),
+                                              timeout=self.connect_timeout) as conn:
+                    conn.sendall(message)
+                with self.lock:
+                    self.sent += 1
+            except OSError:
+                with self.lock:
+                    self.failed += 1
+
+    def done(self):
+        """True once every sender thread has finished"""
+        return not any(thread.is_alive() for thread in self.threads)
+
+
+def run_load(args):
+    """Drive the GUI with each offered rate and return the per-step reports"""
+    # Fail on a bad spec before any Qt setup
+    size_of = parse_size_spec(args.size)
+    if not args.show:
+        os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+    from PyQt6.QtWidgets import QApplication
+    from PyQt6.QtCore import QObject, QTimer, pyqtSlot
+    from rflow_gui import MessageReceiver, RflowWindow
+
+    class LoadMonitor(QObject):
+        """Collects delivery and frame statistics on the GUI thread"""
+
+        def __init__(self, window, render, late_ms, stall_ms):
+            super().__init__()
+            self.window = window
+            self.render = render
+            self.late_s = late_ms / 1000
+            self.stall_s = stall_ms / 1000
+            self.frame_timer = QTimer(self)
+            self.frame_timer.setInterval(16)
+            self.frame_timer.timeout.connect(self.on_frame)
+            self.reset(-1)
+
+        def reset(self, step):
+            """Start a fresh measurement step"""
+            self.step = step
+            self.stale = 0
+            self.received = 0
+            self.received_bytes = 0
+            self.late = 0
+            self.latencies = []
+            self.depth_samples = []
+            self.stalls = 0
+            self.longest_frame = 0.0
+            self.last_frame = time.monotonic()
+
+        @pyqtSlot(str)
+        def on_message(self, message):
+            """A message reached the GUI thread"""
+            now = time.monotonic()
+            try:
+                envelope = json.loads(message)
+                step = envelope["step"]
+                latency = now - envelope["sent"]
+            except (ValueError, KeyError, TypeError):
+                envelope, step = None, None
+            if step != self.step:
+                # Sent by an earlier step after its drain window ran out
+                self.stale += 1
+                return
+            self.received += 1
+            self.received_bytes += len(message)
+            self.latencies.append(latency)
+            if latency > self.late_s:
+                self.late += 1
+            if self.render:
+                self.window.add_message(envelope.get("content", ""), is_user=False)
+
+        def on_frame(self):
+            """Frame tick - a long gap means the event loop was blocked"""
+            now = time.monotonic()
+            gap = now - self.last_frame
+            self.last_frame = now
+            self.longest_frame = max(self.longest_frame, gap)
+            if gap > self.stall_s:
+                self.stalls += 1
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    window = RflowWindow(args.api_url, args.env_url)
+    window.show()
+
+    receiver = MessageReceiver(args.port or free_port())
+    monitor = LoadMonitor(window, args.render, args.late_ms, args.stall_ms)
+    receiver.message_received.connect(monitor.on_message)
+    threading.Thread(target=receiver.start, daemon=True).start()
+    wait_for_port(receiver.port)
+
+    if args.replay:
+        steps = [(f"replay x{args.speed:g}", replay_schedule(args.replay, args.speed))]
+    else:
+        steps = [
+            (f"{rate:g} msg/s",
+             synthetic_schedule(rate, args.duration, size_of, args.token_ratio, args.seed))
+            for rate in args.rate
+        ]
+
+    reports = []
+    state = {"step": -1, "sender": None, "drain_until": None, "started": None}
+    poll = QTimer()
+    poll.setInterval(50)
+
+    def next_step():
+        state["step"] += 1
+        if state["step"] >= len(steps):
+            poll.stop()
+            app.quit()
+            return
+        schedule = steps[state["step"]][1]
+        monitor.reset(state["step"])
+        state["sender"] = LoadSender(receiver.port, schedule, args.concurrency,
+                                     step=state["step"])
+        state["drain_until"] = None
+        state["started"] = time.monotonic()
+        state["sender"].start()
+
+    def on_poll():
+        sender = state["sender"]
+        if sender is None:
+            return
+        monitor.depth_samples.append(max(sender.sent - monitor.received, 0))
+        if not sender.done():
+            return
+        now = time.monotonic()
+        if state["drain_until"] is None:
+            state["drain_until"] = now + args.drain
+        if monitor.received < sender.sent and now < state["drain_until"]:
+            return
+        reports.append(step_report(steps[state["step"]][0], sender, monitor,
+                                   now - state["started"]))
+        next_step()
+
+    poll.timeout.connect(on_poll)
+    monitor.frame_timer.start()
+    poll.start()
+    QTimer.singleShot(0, next_step)
+    app.exec()
+
+    receiver.stop()
+    window.close()
+    return reports
+
+
+def step_report(label, sender, monitor, elapsed):
+    """Summarize one load step"""
+    lost = max(sender.sent - monitor.received, 0)
+    depth = monitor.depth_samples or [0]
+    return {
+        "step": label,
+        "offered": len(sender.schedule),
+        "sent": sender.sent,
+        "received": monitor.received,
+        "dropped": sender.failed + lost,
+        "late": monitor.late,
+        "late_sends": sender.late_sends,
+        "stale": monitor.stale,
+        "throughput_msg_s": monitor.received / elapsed if elapsed else 0.0,
+        "throughput_kb_s": monitor.received_bytes / 1024 / elapsed if elapsed else 0.0,
+        "latency_ms_p50": percentile(monitor.latencies, 50) * 1000,
+        "latency_ms_p95": percentile(monitor.latencies, 95) * 1000,
+        "latency_ms_max": max(monitor.latencies, default=0.0) * 1000,
+        "queue_depth_max": max(depth),
+        "queue_depth_mean": sum(depth) / len(depth),
+        "frame_stalls": monitor.stalls,
+        "longest_frame_ms": monitor.longest_frame * 1000,
+    }
+
+
+def print_reports(reports):
+    """Human-readable summary, flagging the first saturated step"""
+    saturated = None
+    for report in reports:
+        print(f"\n== {report['step']} ==")
+        print(f"  messages   offered {report['offered']}, sent {report['sent']}, "
+              f"received {report['received']}, dropped {report['dropped']}, "
+              f"late {report['late']}, stale {report['stale']}")
+        print(f"  throughput {report['throughput_msg_s']:.1f} msg/s, "
+              f"{report['throughput_kb_s']:.1f} KB/s")
+        print(f"  latency    p50 {report['latency_ms_p50']:.1f} ms, "
+              f"p95 {report['latency_ms_p95']:.1f} ms, max {report['latency_ms_max']:.1f} ms")
+        print(f"  queue      max {report['queue_depth_max']}, "
+              f"mean {report['queue_depth_mean']:.1f}")
+        print(f"  frames     {report['frame_stalls']} stalls, "
+              f"longest {report['longest_frame_ms']:.1f} ms")
+        if saturated is None and (report["dropped"] or report["received"] < report["offered"]):
+            saturated = report["step"]
+    if saturated:
+        print(f"\nSaturation: GUI stopped keeping up at {saturated}")
+
+
+def free_port():
+    """Ask the OS for an unused localhost port"""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for_port(port, timeout=5.0):
+    """Block until the receiver accepts connections"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            # An empty connection is ignored by MessageReceiver
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"MessageReceiver did not start on port {port}")
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description="Load-test the Rflow R -> GUI message pipeline")
+    parser.add_argument("--rate", type=positive_floats,
+                        default=[100.0], help="Offered rate(s) in msg/s, comma separated")
+    parser.add_argument("--duration", type=float, default=5.0,
+                        help="Seconds per synthetic rate step")
+    parser.add_argument("--concurrency", type=positive_int, default=4, help="Sender threads")
+    parser.add_argument("--size", default="lognormal:64,1.0",
+                        help="Payload sizes: fixed:N, uniform:A-B or lognormal:MEDIAN,SIGMA")
+    parser.add_argument("--token-ratio", type=float, default=0.9,
+                        help="Fraction of token messages (rest are tool_status)")
+    parser.add_argument("--replay", help="Recorded JSONL stream to replay instead")
+    parser.add_argument("--speed", type=positive_float, default=1.0, help="Replay speed multiplier")
+    parser.add_argument("--late-ms", type=float, default=100.0,
+                        help="Delivery latency counted as late")
+    parser.add_argument("--stall-ms", type=float, default=50.0,
+                        help="Frame gap counted as a UI stall")
+    parser.add_argument("--drain", type=float, default=5.0,
+                        help="Seconds to wait for in-flight messages after each step")
+    parser.add_argument("--no-render", dest="render", action="store_false",
+                        help="Do not add received messages to the chat view")
+    parser.add_argument("--show", action="store_true", help="Show the window instead of running headless")
+    parser.add_argument("--port", type=int, default=0, help="Receiver port (default: any free port)")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for synthetic streams")
+    parser.add_argument("--json", action="store_true", help="Print the reports as JSON")
+    parser.add_argument("--api-url", default="http://127.0.0.1:8080")
+    parser.add_argument("--env-url", default="tcp://127.0.0.1:8081")
+    args = parser.parse_args()
+
+    reports = run_load(args)
+    if args.json:
+        print(json.dumps(reports, indent=2))
+    else:
+        print_reports(reports)
+
+
+if __name__ == '__main__':
+    main()
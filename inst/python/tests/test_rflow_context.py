@@ -0,0 +1,125 @@
+"""Tests for the token-budgeted conversation context (no Qt required)"""
+
+import os
+import sqlite3
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from rflow_context import ConversationContext, estimate_tokens, session_db_path
+
+
+def make_context(tmp_path, budget, keep_recent=2):
+    return ConversationContext(token_budget=budget, keep_recent=keep_recent,
+                               db_path=str(tmp_path / "chat_history.sqlite"))
+
+
+def roles(context):
+    return [m["role"] for m in context]
+
+
+def test_token_estimates_are_cached_and_totalled(tmp_path):
+    context = make_context(tmp_path, budget=1000)
+    entry = context.add("user", "x" * 40)
+
+    assert entry["tokens"] == estimate_tokens("x" * 40) == 10
+    context.add("assistant", "y" * 8)
+    assert context.total_tokens == 12
+    assert context.total_tokens == sum(m["tokens"] for m in context)
+
+
+def test_old_tool_results_are_compacted_before_eviction(tmp_path):
+    context = make_context(tmp_path, budget=100)
+    context.add("user", "load the data")
+    result = context.add("user", "x" * 2000, message_id=7, tool_result=True)
+    context.add("assistant", "done")
+    context.add("user", "thanks")
+
+    assert result["compacted"]
+    assert "message 7" in result["content"]
+    assert len(context) == 4
+    assert context.total_tokens <= 100
+    assert context.total_tokens == sum(m["tokens"] for m in context)
+
+
+def test_small_tool_results_are_not_grown_by_compaction(tmp_path):
+    context = make_context(tmp_path, budget=5, keep_recent=1)
+    context.add("user", "hi")
+    result = context.add("user", "ok", tool_result=True)
+    context.add("user", "x" * 16)
+
+    assert not result["compacted"]
+    assert result["content"] == "ok"
+    assert context.total_tokens <= 5
+
+
+def test_eviction_removes_whole_turns(tmp_path):
+    context = make_context(tmp_path, budget=30, keep_recent=2)
+    context.add("user", "a" * 40)
+    context.add("assistant", "b" * 40)
+    context.add("user", "c" * 40, tool_result=True)
+    context.add("assistant", "d" * 40)
+    context.add("user", "e" * 40)
+    context.add("assistant", "f" * 40)
+
+    # The first turn (user, assistant, tool result, assistant) went as a unit
+    assert roles(context) == ["user", "assistant"]
+    assert next(iter(context))["content"] == "e" * 40
+    assert context.total_tokens == 20
+
+
+def test_kept_history_starts_with_a_user_message(tmp_path):
+    context = make_context(tmp_path, budget=12, keep_recent=2)
+    for i in range(5):
+        context.add("user", "q" * 16)
+        context.add("assistant", "r" * 16)
+        messages = context.to_messages()
+        assert messages[0]["role"] == "user"
+
+
+def test_recent_messages_are_never_evicted(tmp_path):
+    context = make_context(tmp_path, budget=1, keep_recent=2)
+    context.add("user", "x" * 40)
+    context.add("assistant", "y" * 40)
+
+    assert len(context) == 2
+    assert context.total_tokens > context.token_budget
+
+
+def test_reload_reads_the_session_store(tmp_path):
+    db_path = tmp_path / "chat_history.sqlite"
+    con = sqlite3.connect(db_path)
+    con.execute("CREATE TABLE messages (message_id INTEGER PRIMARY KEY, "
+                "content TEXT, tool_results TEXT)")
+    con.execute("INSERT INTO messages VALUES (7, 'summary', '{\"rows\": 1000}')")
+    con.execute("INSERT INTO messages VALUES (8, 'plain text', NULL)")
+    con.commit()
+    con.close()
+
+    context = make_context(tmp_path, budget=1000)
+    assert context.reload(7) == '{"rows": 1000}'
+    assert context.reload(8) == "plain text"
+    assert context.reload(9) is None
+
+
+def test_reload_does_not_create_a_missing_store(tmp_path):
+    context = ConversationContext(db_path=str(tmp_path / "missing" / "chat.sqlite"))
+    assert context.reload(1) is None
+    assert not (tmp_path / "missing").exists()
+
+    empty = tmp_path / "empty.sqlite"
+    empty.touch()
+    assert ConversationContext(db_path=str(empty)).reload(1) is None
+
+
+def test_malformed_env_settings_fall_back(monkeypatch):
+    monkeypatch.setenv("RFLOW_CONTEXT_TOKENS", "lots")
+    monkeypatch.setenv("RFLOW_CONTEXT_KEEP_RECENT", "")
+    context = ConversationContext()
+    assert context.token_budget == 100000
+    assert context.keep_recent == 6
+
+
+def test_db_path_override(monkeypatch):
+    monkeypatch.setenv("RFLOW_DB_PATH", "/tmp/custom.sqlite")
+    assert session_db_path() == "/tmp/custom.sqlite"